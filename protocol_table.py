@@ -0,0 +1,159 @@
+"""
+Protocol table rendering
+Parses a protocol's markdown table into HTML once per process; the browser
+only inserts the result and carries no markdown parser of its own
+"""
+
+import html
+import re
+
+# Patterns used by format_protocol_cell
+RE_ROLE = re.compile(r'^(HC|RN|RD|PharmD)\s+(.+)$', re.S)
+RE_DSPACE = re.compile(r'\s{2,}')
+RE_NESTED = re.compile(r'(?=Participant |If a participant |If single )')
+RE_YESNO = re.compile(r'^(No|Yes)\s+patient case', re.I)
+
+
+def markdown_to_html(text):
+    """Render **bold**, *template* text, [links](url) and the \\> / \\< escapes"""
+    if not text:
+        return ''
+
+    out = []
+    n = len(text)
+    run = 0  # start of the plain text not yet copied to out
+    i = 0
+    while i < n:
+        token = _markdown_token_at(text, i)
+        if token is None:
+            i += 1
+            continue
+        if run < i:
+            out.append(text[run:i])
+        token_html, i = token
+        out.append(token_html)
+        run = i
+    out.append(text[run:])
+    return ''.join(out)
+
+
+def _markdown_token_at(text, i):
+    """The markdown token starting at i as (html, end), or None for plain text"""
+    c = text[i]
+
+    if c == '*':
+        if text.startswith('*', i + 1):
+            # Bold: **text** on a single line
+            end = text.find('**', i + 3)
+            if end != -1:
+                inner = text[i + 2:end]
+                if '\n' not in inner:
+                    return f'<strong>{markdown_to_html(inner)}</strong>', end + 2
+            return None
+        # Italic *text* marks message template wording
+        end = text.find('*', i + 1)
+        if end > i + 1:
+            return f'<span class="protocol-message-template">{text[i + 1:end]}</span>', end + 1
+        return None
+
+    if c == '[':
+        # Link: [text](url)
+        close = text.find(']', i + 1)
+        if close > i + 1 and text.startswith('(', close + 1):
+            url_end = text.find(')', close + 2)
+            if url_end > close + 2:
+                label = markdown_to_html(text[i + 1:close])
+                return f'<a href="{text[close + 2:url_end]}" target="_blank">{label}</a>', url_end + 1
+        return None
+
+    if c == '\\':
+        if text.startswith('>', i + 1):
+            return '&gt;', i + 2
+        if text.startswith('<', i + 1):
+            return '&lt;', i + 2
+    return None
+
+
+def format_protocol_cell(text):
+    """Render a protocol value cell, splitting double-spaced segments into bullets"""
+    if not text:
+        return ''
+
+    # A leading role indicator (HC, RN, RD, PharmD) becomes a bold prefix
+    role_prefix = ''
+    role_match = RE_ROLE.match(text)
+    if role_match:
+        role_prefix = f'<strong>{role_match.group(1)}</strong><br/>'
+        text = role_match.group(2)
+
+    text = markdown_to_html(text)
+
+    # Single line or very short text
+    if '  ' not in text and len(text) < 100:
+        return role_prefix + text
+
+    segments = [s.strip() for s in RE_DSPACE.split(text) if s.strip()]
+    if len(segments) <= 1:
+        return role_prefix + text
+
+    parts = [role_prefix, '<ul>']
+    for segment in segments:
+        # Nested structures like "No patient case needed if:" or "Yes patient case needed:"
+        if RE_YESNO.match(segment):
+            parts += ['<li><strong>', segment.split(':')[0], ':</strong>']
+
+            after_colon = segment[segment.find(':') + 1:].strip()
+            if after_colon:
+                nested_items = RE_NESTED.split(after_colon)
+                if len(nested_items) > 1:
+                    parts.append('<ul>')
+                    parts += [f'<li>{item.strip()}</li>' for item in nested_items if item.strip()]
+                    parts.append('</ul>')
+                else:
+                    parts += [' ', after_colon]
+
+            parts.append('</li>')
+        else:
+            parts += ['<li>', segment, '</li>']
+
+    parts.append('</ul>')
+    return ''.join(parts)
+
+
+def split_protocol_row(row):
+    """The first two cells of a markdown table row, trimmed, or None"""
+    first = row.find('|')
+    if first < 0:
+        return None
+    second = row.find('|', first + 1)
+    if second < 0:
+        return None
+    third = row.find('|', second + 1)
+    if third < 0:
+        return None
+    return row[first + 1:second].strip(), row[second + 1:third].strip()
+
+
+def render_protocol_table(task_code, task_name, full_text):
+    """Render a protocol's whole table body: the task header row, then its rows"""
+    header = f'<tr><th>{html.escape(task_code, quote=False)}</th><th>{markdown_to_html(task_name)}</th></tr>'
+    return header + render_protocol_rows(full_text)
+
+
+def render_protocol_rows(full_text):
+    """Render the body rows (<tr>...</tr>) of a protocol's markdown table"""
+    if not full_text:
+        return ''
+
+    # Skip the first two non-blank lines (header row and separator)
+    lines = (line for line in full_text.split('\n') if line.strip())
+    rows = []
+    for index, line in enumerate(lines):
+        if index < 2:
+            continue
+        cells = split_protocol_row(line)
+        # Skip short rows and |----|----| separators
+        if not cells or cells[0].startswith('-'):
+            continue
+        rows.append(f'<tr><td>{markdown_to_html(cells[0])}</td><td>{format_protocol_cell(cells[1])}</td></tr>')
+    return ''.join(rows)
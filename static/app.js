@@ -0,0 +1,1490 @@
+let todos = [];
+let patients = [];
+let selectedTodo = null;
+let selectedPatient = null;
+let selectedPatientIndex = null;
+// Rows currently carrying .selected; the virtual lists recycle rows, so the
+// fill functions keep these pointing at whichever row shows the selection
+let selectedPatientNode = null;
+let selectedTodoNode = null;
+let cachedTasks = new Set(); // Track which tasks have cached assistance for current patient
+
+// Elements looked up on hot paths, resolved once (the script runs after they are parsed)
+const DOM = {
+    loadingOverlay: document.getElementById('loadingOverlay'),
+    loadingText: document.getElementById('loadingText'),
+    loadingSubtext: document.getElementById('loadingSubtext'),
+    mainContent: document.getElementById('mainContent'),
+    patientList: document.getElementById('patientListContainer'),
+    todoList: document.getElementById('todoListContainer'),
+    tasksSubheader: document.getElementById('tasksSubheader'),
+    roleSelect: document.getElementById('roleSelect'),
+    editPatientBtn: document.getElementById('editPatientBtn'),
+    lastModified: document.getElementById('lastModified'),
+    patientEditorModal: document.getElementById('patientEditorModal'),
+    patientDataEditor: document.getElementById('patientDataEditor'),
+    saveSuccess: document.getElementById('saveSuccess'),
+    // The protocol accordion on screen; set by renderProtocolReference
+    protocolContent: null,
+    protocolIcon: null
+};
+
+// Load initial data
+function loadInitialData() {
+    try {
+        // ToDos and patients are embedded in the page by the server
+        const bootstrap = JSON.parse(document.getElementById('bootstrapData').textContent);
+        setTodos(bootstrap.todos);
+        patients = bootstrap.patients;
+
+        // Fetch cache badges for every patient up front so selection needs no round-trip
+        patients.forEach((patient, index) => loadCachedTasks(index));
+
+        // Render patient list
+        renderPatientList();
+        renderTodoList();
+
+    } catch (error) {
+        console.error('Error loading data:', error);
+    }
+}
+
+// Windowed list renderer shared by the patient and task lists. Item offsets are
+// kept as a prefix-sum array; only items inside the scroll viewport (plus
+// overscan) exist in the DOM, absolutely positioned and recycled per kind.
+const VIRTUAL_OVERSCAN = 4;
+
+function createVirtualList(container, { heightOf, kindOf, createNode, fillNode, onWindow }) {
+    const scroller = container.parentElement;
+    const pools = {};
+    const rendered = new Map(); // item index -> node
+    let offsets = [0];
+    let frame = null;
+    let dirty = false; // data changed since the visible nodes were filled
+
+    container.classList.add('virtual-list');
+    scroller.addEventListener('scroll', schedule, { passive: true });
+    window.addEventListener('resize', schedule);
+
+    function release(index, node) {
+        node.remove();
+        pools[node.dataset.kind].push(node);
+        rendered.delete(index);
+    }
+
+    function acquire(kind) {
+        if (!pools[kind]) pools[kind] = [];
+        const node = pools[kind].pop() || createNode(kind);
+        node.dataset.kind = kind;
+        return node;
+    }
+
+    function schedule() {
+        if (frame === null) frame = requestAnimationFrame(update);
+    }
+
+    function update() {
+        frame = null;
+        const count = offsets.length - 1;
+        const listTop = container.getBoundingClientRect().top - scroller.getBoundingClientRect().top + scroller.scrollTop;
+        const viewTop = scroller.scrollTop - listTop;
+        const first = findOffsetIndex(offsets, Math.max(0, viewTop));
+        const last = findOffsetIndex(offsets, Math.max(0, viewTop + scroller.clientHeight));
+        const start = Math.max(0, first - VIRTUAL_OVERSCAN);
+        const end = Math.min(count, last + 1 + VIRTUAL_OVERSCAN);
+
+        rendered.forEach((node, index) => {
+            if (index < start || index >= end || (dirty && kindOf(index) !== node.dataset.kind)) {
+                release(index, node);
+            } else if (dirty) {
+                node.style.top = `${offsets[index]}px`;
+                fillNode(node, index);
+            }
+        });
+        dirty = false;
+
+        // New rows are built off-document and inserted with a single append
+        const frag = document.createDocumentFragment();
+        for (let index = start; index < end; index++) {
+            if (rendered.has(index)) continue;
+            const node = acquire(kindOf(index));
+            node.style.top = `${offsets[index]}px`;
+            fillNode(node, index);
+            frag.appendChild(node);
+            rendered.set(index, node);
+        }
+        container.appendChild(frag);
+
+        if (onWindow) onWindow(count > 0 ? first : -1, viewTop);
+    }
+
+    // (Re)lay out `count` items. Visible nodes are refilled in place on the next
+    // animation frame, so several renders in one tick cost a single DOM pass.
+    function setCount(count) {
+        offsets = new Array(count + 1);
+        offsets[0] = 0;
+        for (let i = 0; i < count; i++) {
+            offsets[i + 1] = offsets[i] + heightOf(i);
+        }
+        container.style.height = count > 0 ? `${offsets[count]}px` : '';
+        dirty = true;
+        schedule();
+    }
+
+    return { setCount };
+}
+
+// Index of the last item whose top offset is <= y (binary search over prefix sums)
+function findOffsetIndex(offsets, y) {
+    let lo = 0;
+    let hi = Math.max(0, offsets.length - 2);
+    while (lo < hi) {
+        const mid = (lo + hi + 1) >> 1;
+        if (offsets[mid] <= y) lo = mid;
+        else hi = mid - 1;
+    }
+    return lo;
+}
+
+const PATIENT_ROW_HEIGHT = 72; // .virtual-list .patient-item height + 6px gap
+let patientList = null;
+
+function renderPatientList() {
+    if (!patientList) {
+        patientList = createVirtualList(DOM.patientList, {
+            heightOf: () => PATIENT_ROW_HEIGHT,
+            kindOf: () => 'patient',
+            createNode: createPatientRow,
+            fillNode: fillPatientRow
+        });
+    }
+    patientList.setCount(patients.length);
+}
+
+function createPatientRow() {
+    const row = document.createElement('div');
+    row.className = 'patient-item';
+    const name = document.createElement('div');
+    name.className = 'patient-item-name';
+    const info = document.createElement('div');
+    info.className = 'patient-item-info';
+    row.append(name, info);
+    row.onclick = () => selectPatient(Number(row.dataset.index), row);
+    return row;
+}
+
+function fillPatientRow(row, index) {
+    const demographics = patients[index].demographics;
+    row.dataset.index = index;
+    row.firstChild.textContent = demographics.name;
+    row.lastChild.textContent = `Age ${demographics.age}, ${demographics.gender}`;
+    const isSelected = index === selectedPatientIndex;
+    row.classList.toggle('selected', isSelected);
+    if (isSelected) selectedPatientNode = row;
+}
+
+// Move the .selected class from the previously selected row to `node`
+function moveSelection(previous, node) {
+    if (previous && previous !== node) previous.classList.remove('selected');
+    if (node) node.classList.add('selected');
+    return node;
+}
+
+async function selectPatient(index, row) {
+    selectedPatientIndex = index;
+    selectedPatient = patients[index];
+    selectedTodo = null; // Reset task selection
+
+    // Update UI
+    selectedPatientNode = moveSelection(selectedPatientNode, row);
+    selectedTodoNode = moveSelection(selectedTodoNode, null);
+
+    DOM.tasksSubheader.textContent =
+        `Tasks for ${selectedPatient.demographics.name}`;
+
+    updateEditButton();
+    updateLoadButton();
+
+    // Fetch every task's protocol view in the background while the cache check runs
+    loadTaskBundle(index);
+
+    // Check which tasks have cached assistance for this patient
+    await checkCachedTasks();
+
+    // Re-render todo list with cache indicators
+    renderTodoList();
+
+    prefetchTopTasks(index);
+}
+
+// Warm the detail cache for the P0 tasks a clinician is most likely to open next
+const PREFETCH_TASK_COUNT = 3;
+const prefetchedDetails = new Set(); // patient:role pairs already prefetched
+
+function prefetchTopTasks(patientIndex) {
+    const userRole = DOM.roleSelect.value;
+    const prefetchKey = `${patientIndex}:${userRole}`;
+    if (prefetchedDetails.has(prefetchKey)) return;
+
+    const toPrefetch = groupedTodosCache.P0.filter(t => !cachedTasks.has(t.id)).slice(0, PREFETCH_TASK_COUNT);
+    if (toPrefetch.length === 0) return;
+    prefetchedDetails.add(prefetchKey);
+
+    fetch('/api/generate-detail-batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        priority: 'low',
+        body: JSON.stringify(toPrefetch.map(todo => ({
+            todo_id: todo.id,
+            patient_index: patientIndex,
+            user_role: userRole
+        })))
+    })
+        .then(response => response.json())
+        .then(results => {
+            if (!Array.isArray(results)) throw new Error(results.error);
+
+            const entries = [];
+            results.forEach((data, i) => {
+                if (data.error) return;
+                entries.push([detailCacheKey(patientIndex, toPrefetch[i].id, userRole), data]);
+                markTaskCached(patientIndex, toPrefetch[i].id);
+            });
+            detailCache.put(entries);
+            if (patientIndex === selectedPatientIndex) renderTodoList();
+        })
+        .catch(error => {
+            prefetchedDetails.delete(prefetchKey);
+            console.error('Error prefetching task assistance:', error);
+        });
+}
+
+// Cached-task ids per patient. Lookups are queued and sent to
+// /api/check-cached-tasks in batches (after a short wait or once the batch is full).
+const cachedTasksByPatient = new Map();
+const CACHED_TASKS_BATCH_SIZE = 32;
+const CACHED_TASKS_BATCH_WAIT_MS = 20;
+let cachedTasksQueue = new Map(); // patient index -> pending resolvers
+let cachedTasksTimer = null;
+
+async function checkCachedTasks() {
+    cachedTasks = await loadCachedTasks(selectedPatientIndex);
+}
+
+function loadCachedTasks(patientIndex) {
+    if (cachedTasksByPatient.has(patientIndex)) {
+        return Promise.resolve(cachedTasksByPatient.get(patientIndex));
+    }
+    return new Promise(resolve => {
+        if (!cachedTasksQueue.has(patientIndex)) cachedTasksQueue.set(patientIndex, []);
+        cachedTasksQueue.get(patientIndex).push(resolve);
+
+        if (cachedTasksQueue.size >= CACHED_TASKS_BATCH_SIZE) {
+            flushCachedTasksQueue();
+        } else if (cachedTasksTimer === null) {
+            cachedTasksTimer = setTimeout(flushCachedTasksQueue, CACHED_TASKS_BATCH_WAIT_MS);
+        }
+    });
+}
+
+async function flushCachedTasksQueue() {
+    clearTimeout(cachedTasksTimer);
+    cachedTasksTimer = null;
+    const batch = cachedTasksQueue;
+    cachedTasksQueue = new Map();
+
+    let cached = {};
+    try {
+        const response = await fetch('/api/check-cached-tasks', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                patient_indexes: [...batch.keys()]
+            })
+        });
+        const data = await response.json();
+        cached = data.cached || {};
+    } catch (error) {
+        console.error('Error checking cached tasks:', error);
+    }
+
+    batch.forEach((resolvers, patientIndex) => {
+        const ids = cached[patientIndex];
+        const taskIds = new Set(ids || []);
+        // Failed lookups are not remembered so the next selection retries them
+        if (ids) cachedTasksByPatient.set(patientIndex, taskIds);
+        resolvers.forEach(resolve => resolve(taskIds));
+    });
+}
+
+function markTaskCached(patientIndex, todoId) {
+    if (!cachedTasksByPatient.has(patientIndex)) cachedTasksByPatient.set(patientIndex, new Set());
+    cachedTasksByPatient.get(patientIndex).add(todoId);
+    if (patientIndex === selectedPatientIndex) cachedTasks = cachedTasksByPatient.get(patientIndex);
+}
+
+// Task list: priority headers and task rows flattened into one windowed list,
+// with a sticky overlay showing the priority group at the top of the viewport.
+const PRIORITY_ORDER = ['P0', 'P1', 'P2', 'P3'];
+const TODO_ITEM_HEIGHTS = { header: 32, row: 48 };
+let todoList = null;
+let groupedTodosCache = {};
+let todosById = new Map();
+let todoListItems = [];
+let todoListPlaceholder = null;
+let todoStickyHeader = null;
+
+// Replace the task catalog; priority groups, id lookup and the flat list layout
+// are derived here once instead of on every render
+function setTodos(list) {
+    todos = list;
+    groupedTodosCache = { P0: [], P1: [], P2: [], P3: [] };
+    todos.forEach(todo => {
+        if (groupedTodosCache[todo.priority]) groupedTodosCache[todo.priority].push(todo);
+    });
+    todosById = new Map(todos.map(t => [t.id, t]));
+
+    todoListItems = [];
+    PRIORITY_ORDER.forEach(priority => {
+        const group = groupedTodosCache[priority];
+        if (group.length > 0) {
+            todoListItems.push({ type: 'header', priority });
+            group.forEach(todo => todoListItems.push({ type: 'row', priority, todo }));
+        }
+    });
+}
+
+function renderTodoList() {
+    const container = DOM.todoList;
+    if (!todoList) {
+        todoStickyHeader = document.createElement('div');
+        todoStickyHeader.className = 'sticky-group-header';
+        todoStickyHeader.hidden = true;
+        todoStickyHeader.appendChild(createTodoNode('header'));
+        container.appendChild(todoStickyHeader);
+
+        todoList = createVirtualList(container, {
+            heightOf: i => TODO_ITEM_HEIGHTS[todoListItems[i].type],
+            kindOf: i => todoListItems[i].type,
+            createNode: createTodoNode,
+            fillNode: fillTodoNode,
+            onWindow: updateTodoStickyHeader
+        });
+    }
+
+    if (!selectedPatient) {
+        if (!todoListPlaceholder) {
+            todoListPlaceholder = document.createElement('div');
+            todoListPlaceholder.style.cssText = 'padding: 20px; text-align: center; color: #64748b; font-size: 13px;';
+            todoListPlaceholder.textContent = 'Select a patient to view tasks';
+        }
+        container.appendChild(todoListPlaceholder);
+        todoList.setCount(0);
+        return;
+    }
+    if (todoListPlaceholder) todoListPlaceholder.remove();
+    todoList.setCount(todoListItems.length);
+}
+
+function createTodoNode(kind) {
+    const node = document.createElement('div');
+    if (kind === 'header') {
+        node.className = 'category-header';
+        return node;
+    }
+    node.className = 'todo-item';
+    const label = document.createElement('div');
+    label.className = 'todo-item-label';
+    const title = document.createElement('span');
+    title.className = 'todo-item-title';
+    const badge = document.createElement('span');
+    badge.className = 'cached-badge';
+    badge.innerHTML = '&#10003; Cached';
+    label.append(title, badge);
+    const priority = document.createElement('span');
+    node.append(label, priority);
+    node.onclick = () => selectTodoFromList(todosById.get(node.dataset.todoId), node);
+    return node;
+}
+
+function fillTodoNode(node, index) {
+    const item = todoListItems[index];
+    node.dataset.index = index;
+    if (item.type === 'header') {
+        node.textContent = `Priority ${item.priority}`;
+        return;
+    }
+    const todo = item.todo;
+    node.dataset.todoId = todo.id;
+    const isCached = cachedTasks.has(todo.id);
+    const [label, priority] = node.children;
+    label.firstChild.textContent = todo.name;
+    label.lastChild.hidden = !isCached;
+    priority.className = `priority-badge priority-${todo.priority.toLowerCase()}`;
+    priority.textContent = todo.priority;
+    node.classList.toggle('cached', isCached);
+    const isSelected = selectedTodo !== null && selectedTodo.id === todo.id;
+    node.classList.toggle('selected', isSelected);
+    if (isSelected) selectedTodoNode = node;
+}
+
+function updateTodoStickyHeader(first, viewTop) {
+    const show = first >= 0 && viewTop > 0;
+    todoStickyHeader.hidden = !show;
+    if (show) {
+        todoStickyHeader.firstChild.textContent = `Priority ${todoListItems[first].priority}`;
+    }
+}
+
+async function selectTodoFromList(todo, node) {
+    selectedTodo = todo;
+    updateLoadButton();
+
+    // Highlight in list
+    selectedTodoNode = moveSelection(selectedTodoNode, node);
+
+    // Load protocol immediately (no LLM call)
+    await loadProtocolView();
+}
+
+// Protocol views for all of a patient's tasks, fetched with one /api/task-bundle
+// request on patient selection so opening a task usually needs no round trip
+const taskBundles = new Map(); // patient index -> promise of {todo_id: view}
+
+function loadTaskBundle(patientIndex) {
+    if (!taskBundles.has(patientIndex)) {
+        const bundle = fetch('/api/task-bundle', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                patient_index: patientIndex,
+                todo_ids: todos.map(todo => todo.id)
+            })
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.tasks) throw new Error(data.error);
+                return data.tasks;
+            })
+            .catch(error => {
+                // Not remembered, so the next selection retries the bundle
+                taskBundles.delete(patientIndex);
+                console.error('Error loading task bundle:', error);
+                return {};
+            });
+        taskBundles.set(patientIndex, bundle);
+    }
+    return taskBundles.get(patientIndex);
+}
+
+async function loadProtocolView() {
+    if (!selectedTodo || !selectedPatient) return;
+
+    const todo = selectedTodo;
+    const bundled = (await loadTaskBundle(selectedPatientIndex))[todo.id];
+    if (selectedTodo !== todo) return; // another task was picked meanwhile
+    if (bundled && !bundled.error) {
+        // The bundle's cache flag predates any generation since it was fetched
+        renderProtocolOnlyView(Object.assign({}, bundled, {
+            has_cached_assistance: bundled.has_cached_assistance || cachedTasks.has(todo.id)
+        }));
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/get-protocol', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                todo_id: selectedTodo.id,
+                patient_index: selectedPatientIndex
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.error) {
+            showError(data.error);
+        } else {
+            renderProtocolOnlyView(data);
+        }
+
+    } catch (error) {
+        showError('Failed to load protocol: ' + error.message);
+    }
+}
+
+// Event listeners
+// (Task Assistance button is now in the detail view, not in sidebar)
+
+function updateLoadButton() {
+    // No longer needed - button is in detail view
+}
+
+// Generated detail views mirrored into IndexedDB so reopening a task (even after a
+// reload) renders instantly while the server copy is revalidated in the background.
+const detailCache = {
+    dbPromise: null,
+    memory: new Map(), // same entries, for repeat opens within this page load
+
+    open() {
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                // Version 2 dropped full_text from the protocol payload, so
+                // views stored by version 1 are discarded on upgrade
+                const request = indexedDB.open('taskAssistanceCache', 2);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    if (db.objectStoreNames.contains('details')) db.deleteObjectStore('details');
+                    db.createObjectStore('details');
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this.dbPromise;
+    },
+
+    async get(key) {
+        if (this.memory.has(key)) return this.memory.get(key);
+        try {
+            const db = await this.open();
+            return await new Promise((resolve, reject) => {
+                const request = db.transaction('details').objectStore('details').get(key);
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        } catch (error) {
+            console.error('Detail cache read failed:', error);
+            return undefined;
+        }
+    },
+
+    // Write several [key, value] entries in a single transaction
+    async put(entries) {
+        entries.forEach(([key, value]) => this.memory.set(key, value));
+        try {
+            const db = await this.open();
+            await new Promise((resolve, reject) => {
+                const tx = db.transaction('details', 'readwrite');
+                const store = tx.objectStore('details');
+                entries.forEach(([key, value]) => store.put(value, key));
+                tx.oncomplete = resolve;
+                tx.onerror = () => reject(tx.error);
+            });
+        } catch (error) {
+            console.error('Detail cache write failed:', error);
+        }
+    }
+};
+
+function detailCacheKey(patientIndex, todoId, userRole) {
+    return `${patientIndex}:${todoId}:${userRole}`;
+}
+
+// Switching roles reloads an open detail view for the new role (from the detail
+// cache when possible). Debounced so flipping through roles only loads the last one.
+const ROLE_CHANGE_DEBOUNCE_MS = 250;
+let detailViewShown = false;
+let roleChangeTimer = null;
+
+DOM.roleSelect.addEventListener('change', () => {
+    clearTimeout(roleChangeTimer);
+    roleChangeTimer = setTimeout(() => {
+        if (detailViewShown) loadDetailView();
+    }, ROLE_CHANGE_DEBOUNCE_MS);
+});
+
+async function loadDetailView(forceRefresh = false) {
+    if (!selectedTodo || !selectedPatient) return;
+
+    const todoId = selectedTodo.id;
+    const patientIndex = selectedPatientIndex;
+    const userRole = DOM.roleSelect.value;
+    const cacheKey = detailCacheKey(patientIndex, todoId, userRole);
+
+    // Stale-while-revalidate: show the local copy now, fetch the server copy behind it
+    const stored = forceRefresh ? undefined : await detailCache.get(cacheKey);
+    const isStillSelected = () =>
+        selectedTodo && selectedTodo.id === todoId && selectedPatientIndex === patientIndex;
+
+    // Show loading overlay with appropriate message
+    const { loadingText, loadingSubtext } = DOM;
+
+    if (stored) {
+        renderDetailView(stored);
+    } else {
+        if (forceRefresh) {
+            loadingText.textContent = 'Generating fresh AI insights...';
+            loadingSubtext.textContent = 'This may take 10-20 seconds';
+        } else {
+            loadingText.textContent = 'Loading Task Assistance...';
+            loadingSubtext.textContent = 'Checking for cached data...';
+        }
+
+        DOM.loadingOverlay.hidden = false;
+    }
+
+    try {
+        const response = await fetch('/api/generate-detail-stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                todo_id: todoId,
+                patient_index: patientIndex,
+                user_role: userRole,
+                refresh: forceRefresh
+            })
+        });
+
+        // Sections (and list items) stream in while the LLM generates and are rendered as they arrive
+        // (at most once per frame); the final event carries the full view
+        let data = null;
+        let partial = null;
+        let partialFrame = null;
+
+        const renderPartial = () => {
+            partialFrame = null;
+            if (data || !isStillSelected()) return;
+            renderDetailView(partial);
+            DOM.loadingOverlay.hidden = true;
+        };
+
+        if (!response.ok) {
+            data = await response.json();
+        } else {
+            await readEventStream(response, (event, payload) => {
+                if (event !== 'section' && event !== 'item') {
+                    data = payload;
+                } else if (!stored) {
+                    if (!partial) {
+                        partial = {
+                            task_title: selectedTodo.name,
+                            priority: selectedTodo.priority,
+                            patient_name: selectedPatient.demographics.name,
+                            streaming: true
+                        };
+                    }
+                    if (event === 'item') {
+                        // List fields arrive one element at a time
+                        (partial[payload.key] ||= [])[payload.index] = payload.value;
+                    } else {
+                        partial[payload.key] = payload.value;
+                    }
+                    if (partialFrame === null) partialFrame = requestAnimationFrame(renderPartial);
+                }
+            });
+        }
+        if (partialFrame !== null) cancelAnimationFrame(partialFrame);
+
+        // The overlay lifts on the first partial paint, so another task may have
+        // been picked while this one generated; only paint if it is still open
+        const showResult = isStillSelected();
+
+        if (!data) {
+            if (!stored && showResult) showError('Task Assistance stream ended unexpectedly');
+            return;
+        }
+
+        if (data.error) {
+            if (!stored && showResult) showError(data.error);
+        } else {
+            detailCache.put([[cacheKey, data]]);
+
+            // Only repaint a revalidated view if it changed and is still on screen
+            if (showResult && (!stored || JSON.stringify(stored) !== JSON.stringify(data))) {
+                renderDetailView(data);
+            }
+
+            // Newly generated assistance is saved server-side, so badge it locally
+            if (!data.from_cache) {
+                markTaskCached(patientIndex, todoId);
+                renderTodoList();
+            }
+        }
+
+    } catch (error) {
+        if (stored || !isStillSelected()) {
+            console.error('Failed to revalidate detail view:', error);
+        } else {
+            showError('Failed to generate detail view: ' + error.message);
+        }
+    } finally {
+        if (isStillSelected()) DOM.loadingOverlay.hidden = true;
+    }
+}
+
+// Read a Server-Sent Events response, calling onEvent(event, data) for each event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+// Clone a <template> from index.html; values are filled in through textContent
+function cloneTemplate(id) {
+    return document.importNode(document.getElementById(id).content, true);
+}
+
+function cloneElement(id) {
+    return cloneTemplate(id).firstElementChild;
+}
+
+// Set a slot's text, skipping the DOM write when it is already current
+function fillSlot(root, slot, text) {
+    const node = root.dataset && root.dataset.slot === slot ? root : root.querySelector(`[data-slot="${slot}"]`);
+    const value = text == null ? '' : String(text);
+    if (node.textContent !== value) node.textContent = value;
+    return node;
+}
+
+// The detail view is reconciled rather than rebuilt: it is a tree of keyed blocks,
+// and a block already on screen is refilled only when the slice of `detail` it
+// shows has changed. Repeated rows are keyed by a hash of their content, so
+// unchanged rows are kept and just moved into place.
+const nodeKeys = new WeakMap();   // node -> reconciliation key
+const nodeHashes = new WeakMap(); // block node -> hash of the data it was filled from
+let detailRoot = null;
+
+// FNV-1a hash of a value's JSON text, used as a compact content key
+function hashKey(value) {
+    const text = JSON.stringify(value) ?? '';
+    let hash = 0x811c9dc5;
+    for (let i = 0; i < text.length; i++) {
+        hash ^= text.charCodeAt(i);
+        hash = Math.imul(hash, 0x01000193);
+    }
+    return (hash >>> 0).toString(36);
+}
+
+// Row nodes dropped from a list are kept here and refilled on the next build
+// instead of allocating fresh DOM for every regenerated list
+const pools = { keyPoint: [], overviewItem: [], caveat: [], timelineRow: [] };
+const nodePools = new WeakMap(); // pooled node -> the pool it returns to
+
+function acquire(pool, className, tag = 'div') {
+    const node = pool.pop() || Object.assign(document.createElement(tag), { className });
+    nodePools.set(node, pool);
+    return node;
+}
+
+function acquireTemplate(pool, id) {
+    const node = pool.pop() || cloneElement(id);
+    nodePools.set(node, pool);
+    return node;
+}
+
+function release(node) {
+    node.remove();
+    const pool = nodePools.get(node);
+    if (pool) pool.push(node);
+}
+
+// Make container's keyed children match `items`: matching nodes are reused (moved
+// with insertBefore), new ones built, leftovers released. Unkeyed children at the
+// start of the container (section headers and the like) are left alone.
+function reconcileKeyed(container, items, keyOf, build, update) {
+    const existing = new Map();
+    let next = null;
+    for (const child of container.children) {
+        if (!nodeKeys.has(child)) continue;
+        if (next === null) next = child;
+        const key = nodeKeys.get(child);
+        if (!existing.has(key)) existing.set(key, []);
+        existing.get(key).push(child);
+    }
+
+    // Nodes appended past the last existing child are flushed in one fragment
+    const tail = document.createDocumentFragment();
+    items.forEach((item, index) => {
+        const key = keyOf(item);
+        const matches = existing.get(key);
+        let node = matches && matches.shift();
+        if (!node) {
+            node = build(item);
+            nodeKeys.set(node, key);
+        }
+        if (update) update(node, item, index);
+        if (node === next) next = next.nextElementSibling;
+        else if (next === null) tail.appendChild(node);
+        else container.insertBefore(node, next);
+    });
+
+    existing.forEach(nodes => nodes.forEach(release));
+    container.appendChild(tail);
+}
+
+// Blocks are { key, template | build, data, fill(node, data) }
+function reconcileBlocks(container, blocks) {
+    reconcileKeyed(container, blocks, block => block.key,
+        block => block.build ? block.build() : cloneElement(block.template),
+        (node, block) => {
+            const hash = hashKey(block.data);
+            if (nodeHashes.get(node) !== hash) {
+                block.fill(node, block.data);
+                nodeHashes.set(node, hash);
+            }
+        });
+}
+
+function reconcileTextList(container, texts, pool, className, tag) {
+    reconcileKeyed(container, texts, hashKey, text => {
+        const node = acquire(pool, className, tag);
+        node.textContent = text;
+        return node;
+    });
+}
+
+// Sections below the fold defer their row construction until they are about to
+// be seen. A `data-lazy` node holds its latest fill until it first intersects;
+// after that it is filled immediately like any other block.
+const pendingFills = new WeakMap(); // lazy node -> fill waiting for visibility
+let lazyObserver = null;
+
+function whenVisible(node, fill) {
+    if (!node.dataset.lazy || !('IntersectionObserver' in window)) {
+        fill(node);
+        return;
+    }
+    if (!lazyObserver) {
+        lazyObserver = new IntersectionObserver(entries => {
+            for (const entry of entries) {
+                if (!entry.isIntersecting) continue;
+                const target = entry.target;
+                lazyObserver.unobserve(target);
+                delete target.dataset.lazy;
+                const pending = pendingFills.get(target);
+                pendingFills.delete(target);
+                if (pending) pending(target);
+            }
+        }, { root: DOM.mainContent, rootMargin: '200px 0px' });
+    }
+    pendingFills.set(node, fill);
+    lazyObserver.observe(node);
+}
+
+const ROLE_LABEL = new Map([
+    ['RN', 'Registered Nurse'],
+    ['HC', 'Health Coach'],
+    ['RD', 'Registered Dietitian'],
+    ['PharmD', 'Pharmacist']
+]);
+
+const PROTOCOL_VARIANT_LABEL = new Map([
+    ['Clinic', 'Clinic Steps'],
+    ['Non-Clinic', 'Non-Clinic Steps']
+]);
+
+function renderDetailView(detail) {
+    const { mainContent } = DOM;
+    const initial = detail.patient_initial || detail.patient_name.charAt(0);
+
+    // Store messages and steps for the delegated action buttons
+    currentMessages = detail.suggested_messages || [];
+    currentProtocolSteps = detail.protocol_steps || [];
+
+    // Build the view shell once; later renders patch it in place
+    if (!detailRoot || !detailRoot.isConnected) {
+        detailRoot = cloneElement('tmpl-detail');
+        mainContent.replaceChildren(detailRoot);
+    }
+    const viewKey = `${detail.patient_name}|${detail.task_title}`;
+    const isNewTask = detailRoot.dataset.viewKey !== viewKey;
+    detailRoot.dataset.viewKey = viewKey;
+
+    fillSlot(detailRoot, 'task-title', detail.task_title);
+    fillSlot(detailRoot, 'patient-initial', initial);
+    fillSlot(detailRoot, 'patient-name', detail.patient_name);
+    fillSlot(detailRoot, 'priority', detail.priority).className = `priority-badge priority-${detail.priority.toLowerCase()}`;
+
+    // Resolve the confidence decision once for every branch below
+    const confidence = detail.confidence;
+    const showSummary = !confidence || confidence.decision === 'show';
+    const suppressed = !!confidence && confidence.decision === 'suppress';
+    const caveats = showSummary && confidence && confidence.caveats || [];
+
+    // Verily Intelligence Section
+    const verily = detailRoot.querySelector('[data-slot="verily"]');
+    const verilyBlocks = [];
+
+    if (detail.from_cache) {
+        verilyBlocks.push({
+            key: 'cache-notice', template: 'tmpl-cache-notice', data: detail.cached_timestamp,
+            fill: (node, timestamp) => fillSlot(node, 'cached-at', timestamp ? new Date(timestamp).toLocaleString() : 'previously')
+        });
+    }
+    if (detail.saved_filepath && !detail.from_cache) {
+        verilyBlocks.push({
+            key: 'saved-notice', template: 'tmpl-saved-notice', data: detail.saved_filepath,
+            fill: (node, filepath) => fillSlot(node, 'saved-filepath', filepath)
+        });
+    }
+
+    if (detail.user_context) {
+        verilyBlocks.push({
+            key: 'user-context', template: 'tmpl-user-context', data: detail.user_context,
+            fill: (node, context) => {
+                fillSlot(node, 'role', context.role);
+                const roleLabel = ROLE_LABEL.get(context.role);
+                fillSlot(node, 'role-label', roleLabel ? `(${roleLabel})` : '');
+                fillSlot(node, 'protocol-variant', PROTOCOL_VARIANT_LABEL.get(context.clinic_context) || 'General Steps');
+            }
+        });
+    }
+
+    // Confidence Handling
+    if (suppressed) {
+        verilyBlocks.push({
+            key: 'suppressed', template: 'tmpl-suppressed', data: confidence.suppression_reason,
+            fill: (node, reason) => fillSlot(node, 'suppression-reason', reason)
+        });
+    }
+
+    if (caveats.length > 0) {
+        verilyBlocks.push({
+            key: 'caveats', template: 'tmpl-caveats', data: caveats,
+            fill: (node, caveats) => reconcileKeyed(node, caveats, hashKey, caveat => {
+                const row = acquireTemplate(pools.caveat, 'tmpl-caveat');
+                fillSlot(row, 'caveat', caveat);
+                return row;
+            })
+        });
+    }
+
+    verilyBlocks.push({ key: 'vi-note', template: 'tmpl-vi-note', data: null, fill: () => {} });
+
+    if (suppressed) {
+        verilyBlocks.push({ key: 'summary-unavailable', template: 'tmpl-summary-unavailable', data: null, fill: () => {} });
+    } else {
+        verilyBlocks.push({
+            key: 'context-title', template: 'tmpl-context-title', data: detail.task_title,
+            fill: (node, title) => fillSlot(node, 'context-title', `Context for "${title}"`)
+        });
+    }
+
+    // A suppressed summary hides everything below the Verily Intelligence card
+    const sectionBlocks = [];
+    if (showSummary) {
+        verilyBlocks.push(...insightBlocks(detail));
+
+        if (detail.clinical_assessment) {
+            sectionBlocks.push({
+                key: 'assessment', template: 'tmpl-assessment', data: detail.clinical_assessment,
+                fill: fillClinicalAssessment
+            });
+        }
+
+        // Protocol Reference
+        if (detail.protocol) {
+            sectionBlocks.push({
+                key: 'protocol-reference', build: () => document.createElement('div'), data: detail.protocol,
+                fill: (node, protocol) => node.replaceChildren(renderProtocolReference(protocol))
+            });
+        }
+
+        if (detail.suggested_messages && detail.suggested_messages.length > 0) {
+            sectionBlocks.push({
+                key: 'messages', template: 'tmpl-messages', data: detail.suggested_messages,
+                fill: fillSuggestedMessages
+            });
+        }
+
+        if (detail.protocol_steps && detail.protocol_steps.length > 0) {
+            sectionBlocks.push({
+                key: 'protocol-steps', template: 'tmpl-protocol-steps', data: detail.protocol_steps,
+                fill: fillProtocolSteps
+            });
+        }
+    }
+
+    reconcileBlocks(verily, verilyBlocks);
+    reconcileBlocks(detailRoot, sectionBlocks);
+
+    const asOf = verily.querySelector('[data-slot="as-of"]');
+    if (asOf) asOf.textContent = `As of: ${new Date().toLocaleString()}`;
+    detailViewShown = true;
+
+    // Scroll to top when switching to a different task
+    if (isNewTask) mainContent.scrollTop = 0;
+}
+
+function insightBlocks(detail) {
+    const blocks = [];
+
+    // While a view is streaming, sections that have not arrived yet are skipped
+    // and a placeholder holds the insight's place
+    if (!detail.ai_insight) {
+        if (detail.streaming) {
+            blocks.push({ key: 'insight-pending', template: 'tmpl-insight-pending', data: null, fill: () => {} });
+        }
+    } else blocks.push({
+        key: 'insight', template: 'tmpl-insight', data: detail.ai_insight,
+        fill: (node, insight) => {
+            // AI Insight
+            fillSlot(node, 'summary', insight.summary);
+            const keyPoints = node.querySelector('[data-slot="key-points"]');
+            const points = insight.key_points || [];
+            keyPoints.hidden = points.length === 0;
+            reconcileTextList(keyPoints, points, pools.keyPoint, 'key-point');
+        }
+    });
+
+    if (detail.participant_overview) blocks.push({
+        key: 'overview', template: 'tmpl-overview', data: detail.participant_overview,
+        fill: (node, overview) => {
+            // Participant Overview
+            const items = [
+                ...overview.conditions.map(c => ({ text: `Condition(s): ${c}` })),
+                ...overview.devices.map(d => ({ text: `Device(s): ${d}` })),
+                { clinicMember: overview.clinic_member }
+            ];
+            if (overview.insulin_strategy) {
+                items.push({ text: `Insulin strategy: ${overview.insulin_strategy}` });
+            }
+            reconcileKeyed(node.querySelector('[data-slot="overview"]'), items, hashKey, item => {
+                if (item.text !== undefined) {
+                    const node = acquire(pools.overviewItem, 'overview-item', 'li');
+                    node.textContent = item.text;
+                    return node;
+                }
+                const status = cloneElement('tmpl-clinic-status');
+                fillSlot(status, 'clinic-badge', item.clinicMember === 'Yes' ? '\u{1F3E5} Clinic Member' : '\u{1F3E0} Non-Clinic')
+                    .classList.add(`clinic-badge-${item.clinicMember.toLowerCase()}`);
+                return status;
+            });
+        }
+    });
+
+    // Clinical Incident Timeline
+    if (detail.clinical_incident) {
+        blocks.push({
+            key: 'timeline', template: 'tmpl-timeline', data: detail.clinical_incident,
+            fill: (node, incident) => {
+                fillSlot(node, 'incident-title', incident.title);
+                // Rows are built only once the table scrolls near the viewport
+                whenVisible(node.querySelector('[data-slot="timeline"]'), tbody => {
+                    reconcileKeyed(tbody, incident.timeline, hashKey, event => {
+                        const row = acquireTemplate(pools.timelineRow, 'tmpl-timeline-row');
+                        fillSlot(row, 'action', event.action);
+                        fillSlot(row, 'details', event.details);
+                        return row;
+                    });
+                });
+            }
+        });
+    }
+    return blocks;
+}
+
+function fillClinicalAssessment(section, assessment) {
+    fillSlot(section, 'severity', assessment.severity);
+    fillSlot(section, 'urgency', assessment.urgency);
+    fillSlot(section, 'trends', assessment.trends);
+
+    const factors = assessment.contributing_factors || [];
+    section.querySelector('[data-slot="factors-section"]').hidden = factors.length === 0;
+    reconcileTextList(section.querySelector('[data-slot="factors"]'), factors, pools.overviewItem, 'overview-item', 'li');
+}
+
+function fillSuggestedMessages(section, messages) {
+    reconcileKeyed(section, messages, hashKey, msg => {
+        const row = cloneElement('tmpl-message-card');
+        fillSlot(row, 'category', msg.category);
+        fillSlot(row, 'type', msg.type.replace('_', ' '));
+        fillSlot(row, 'message', msg.message);
+        fillSlot(row, 'rationale', `Rationale: ${msg.rationale}`);
+        return row;
+    }, (row, msg, idx) => {
+        // Cards are keyed by content, so positions are refreshed on every pass
+        row.querySelector('[data-slot="message"]').id = `message-text-${idx}`;
+        row.querySelectorAll('[data-action]').forEach(button => {
+            button.dataset.index = idx;
+        });
+    });
+}
+
+function fillProtocolSteps(section, steps) {
+    reconcileKeyed(section, steps, hashKey, step => {
+        const row = cloneElement('tmpl-protocol-step');
+        fillSlot(row, 'step-text', step);
+        return row;
+    }, (row, step, idx) => {
+        row.querySelector('[data-action="step-assist"]').dataset.index = idx;
+        fillSlot(row, 'step-label', `Step ${idx + 1}:`);
+    });
+}
+
+function renderProtocolOnlyView(data) {
+    const { mainContent } = DOM;
+    detailViewShown = false;
+    const initial = data.patient_name.charAt(0);
+
+    const hasCached = data.has_cached_assistance;
+    const view = cloneElement('tmpl-protocol-view');
+    fillSlot(view, 'task-title', data.task_title);
+    fillSlot(view, 'patient-initial', initial);
+    fillSlot(view, 'patient-name', data.patient_name);
+    fillSlot(view, 'priority', data.priority).classList.add(`priority-${data.priority.toLowerCase()}`);
+    fillSlot(view, 'load-button', hasCached ? '\u2713 Load Cached Task Assistance' : '\u{1F916} Generate Task Assistance')
+        .classList.toggle('is-cached', hasCached);
+    fillSlot(view, 'load-hint', hasCached ? '\u{1F4BE} Previously generated - loads instantly' : '\u23F0 Will generate AI insights (10-20 seconds)');
+
+    // Protocol Reference
+    if (data.protocol) view.appendChild(renderProtocolReference(data.protocol));
+    mainContent.replaceChildren(view);
+
+    // Auto-expand protocol
+    setTimeout(() => {
+        const { protocolContent: content, protocolIcon: icon } = DOM;
+        if (content && icon && content.isConnected) {
+            renderPendingProtocol(content);
+            content.classList.add('open');
+            icon.classList.add('open');
+        }
+    }, 100);
+
+    // Scroll to top
+    mainContent.scrollTop = 0;
+}
+
+function showError(message) {
+    const { mainContent } = DOM;
+    detailViewShown = false;
+    const error = document.createElement('div');
+    error.className = 'error-message';
+    const label = document.createElement('strong');
+    label.textContent = 'Error:';
+    error.append(label, ` ${message}`);
+    mainContent.replaceChildren(error);
+}
+
+// Build the protocol accordion; its table arrives pre-rendered as table_html
+function renderProtocolReference(protocol) {
+    const accordion = cloneElement('tmpl-protocol-reference');
+
+    DOM.protocolContent = accordion.querySelector('#protocolContent');
+    DOM.protocolIcon = accordion.querySelector('#protocolIcon');
+
+    // The table is inserted when the accordion first opens
+    if (protocol.table_html) {
+        pendingProtocols.set(accordion.querySelector('[data-slot="protocol-table"]'), protocol);
+    }
+
+    return accordion;
+}
+
+const pendingProtocols = new WeakMap(); // table slot -> protocol not yet rendered into it
+
+function renderPendingProtocol(content) {
+    const slot = content.querySelector('[data-slot="protocol-table"]');
+    const protocol = pendingProtocols.get(slot);
+    if (protocol) {
+        pendingProtocols.delete(slot);
+        slot.appendChild(protocolTable(protocol));
+    }
+}
+
+// Built protocol tables, keyed by a hash of their HTML. Switching between
+// tasks that share a protocol clones the built table instead of parsing the
+// HTML again. Oldest entries are evicted first.
+const PROTOCOL_TABLE_CACHE_SIZE = 64;
+const protocolTables = new Map();
+
+function protocolTable(protocol) {
+    const key = hashKey([protocol.table_html]);
+    let table = protocolTables.get(key);
+    if (!table) {
+        table = buildProtocolTable(protocol);
+        if (protocolTables.size >= PROTOCOL_TABLE_CACHE_SIZE) {
+            protocolTables.delete(protocolTables.keys().next().value);
+        }
+        protocolTables.set(key, table);
+    }
+    return table.cloneNode(true);
+}
+
+function buildProtocolTable(protocol) {
+    const table = document.createElement('table');
+    table.className = 'protocol-table';
+    table.createTBody().innerHTML = protocol.table_html;
+    return table;
+}
+
+function toggleProtocol() {
+    const { protocolContent: content, protocolIcon: icon } = DOM;
+
+    if (content.classList.contains('open')) {
+        content.classList.remove('open');
+        icon.classList.remove('open');
+    } else {
+        renderPendingProtocol(content);
+        content.classList.add('open');
+        icon.classList.add('open');
+    }
+}
+
+function scrollToProtocolSteps() {
+    const stepsSection = document.querySelector('.section-card:last-child');
+    if (stepsSection) {
+        stepsSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
+    }
+}
+
+function refreshTaskAssistance() {
+    // Force regeneration by passing refresh flag
+    loadDetailView(true);
+}
+
+// Store current messages for editing
+let currentMessages = [];
+let currentProtocolSteps = [];
+
+// One delegated listener serves the copy, edit and step-assist buttons of
+// every rendered card; buttons carry only an action and an index
+DOM.mainContent.addEventListener('click', e => {
+    const button = e.target.closest('[data-action]');
+    if (!button) return;
+    const idx = Number(button.dataset.index);
+    switch (button.dataset.action) {
+        case 'copy': copyMessage(idx, button); break;
+        case 'edit': editAndSendMessage(idx); break;
+        case 'step-assist': requestStepAssistance(idx, currentProtocolSteps[idx]); break;
+    }
+});
+
+function copyMessage(messageIndex, button) {
+    const messageText = currentMessages[messageIndex].message;
+
+    // Copy to clipboard
+    navigator.clipboard.writeText(messageText).then(() => {
+        // Show temporary success feedback
+        showCopied(button, '\u2713');
+    }).catch(err => {
+        console.error('Failed to copy:', err);
+        alert('Failed to copy message to clipboard');
+    });
+}
+
+function editAndSendMessage(messageIndex) {
+    const message = currentMessages[messageIndex];
+
+    // Create modal
+    const modal = cloneElement('tmpl-message-editor');
+    modal.onclick = (e) => {
+        if (e.target === modal) {
+            closeMessageEditor();
+        }
+    };
+    fillSlot(modal, 'category', message.category);
+    fillSlot(modal, 'rationale', message.rationale);
+    const charCount = fillSlot(modal, 'char-count', message.message.length);
+    const textarea = modal.querySelector('#messageEditorText');
+    textarea.value = message.message;
+
+    document.body.appendChild(modal);
+
+    // Add escape key listener
+    document.addEventListener('keydown', closeMessageEditorOnEscape);
+
+    // Focus textarea
+    setTimeout(() => {
+        textarea.focus();
+        textarea.setSelectionRange(textarea.value.length, textarea.value.length);
+
+        // Add character counter, written at most once per frame
+        let countPending = false;
+        textarea.addEventListener('input', () => {
+            if (countPending) return;
+            countPending = true;
+            requestAnimationFrame(() => {
+                countPending = false;
+                charCount.textContent = textarea.value.length;
+            });
+        });
+    }, 100);
+}
+
+function closeMessageEditorOnEscape(e) {
+    if (e.key === 'Escape') {
+        closeMessageEditor();
+    }
+}
+
+function closeMessageEditor() {
+    const modal = document.querySelector('.message-editor-modal');
+    if (modal) {
+        // Remove escape key listener
+        document.removeEventListener('keydown', closeMessageEditorOnEscape);
+
+        modal.remove();
+    }
+}
+
+// Swap a copy button's label and style to a success state for a moment
+function showCopied(button, label) {
+    const originalText = button.textContent;
+    button.textContent = label;
+    button.classList.add('is-success');
+
+    setTimeout(() => {
+        button.textContent = originalText;
+        button.classList.remove('is-success');
+    }, 1500);
+}
+
+function copyEditedMessage(button) {
+    const textarea = document.getElementById('messageEditorText');
+    const messageText = textarea.value;
+
+    navigator.clipboard.writeText(messageText).then(() => {
+        // Show success in button
+        showCopied(button, '\u2713 Copied');
+    }).catch(err => {
+        console.error('Failed to copy:', err);
+        alert('Failed to copy message');
+    });
+}
+
+function sendMessage() {
+    const textarea = document.getElementById('messageEditorText');
+    const messageText = textarea.value;
+
+    if (!messageText.trim()) {
+        alert('Message cannot be empty');
+        return;
+    }
+
+    // TODO: Integrate with your messaging system
+    // For now, just show a success message
+    alert('Message ready to send:\n\n' + messageText + '\n\n(Integration with messaging system pending)');
+
+    closeMessageEditor();
+}
+
+function requestStepAssistance(stepIndex, stepText) {
+    // TODO: Implement AI agent assistance for protocol steps
+    const stepNumber = stepIndex + 1;
+    alert('Step Assistance for Step ' + stepNumber + ':\n\n' + stepText + '\n\n(AI agent integration pending)');
+
+    // When integrated, this will:
+    // - Send step text + patient context to AI agent
+    // - Get guidance on executing this specific step
+    // - Show suggested actions, messages, or chart updates
+}
+
+
+// Patient Editor Functions
+let editingPatientIndex = null;
+
+function updateEditButton() {
+    const { editPatientBtn: btn, lastModified: lastModDiv } = DOM;
+
+    btn.disabled = selectedPatient === null;
+
+    const lastModified = selectedPatient && selectedPatient.metadata && selectedPatient.metadata.last_modified;
+    if (lastModified) {
+        lastModDiv.textContent = `Last edited: ${new Date(lastModified).toLocaleString()}`;
+    }
+    lastModDiv.hidden = !lastModified;
+}
+
+DOM.editPatientBtn.addEventListener('click', openPatientEditor);
+
+async function openPatientEditor() {
+    if (!selectedPatient) return;
+
+    editingPatientIndex = patients.indexOf(selectedPatient);
+
+    // Fetch full patient data from server
+    try {
+        const response = await fetch(`/api/patient/${editingPatientIndex}`);
+        const fullPatient = await response.json();
+
+        DOM.patientDataEditor.value = JSON.stringify(fullPatient, null, 2);
+
+        DOM.patientEditorModal.hidden = false;
+        DOM.saveSuccess.hidden = true;
+    } catch (error) {
+        alert('Error loading patient data: ' + error.message);
+    }
+}
+
+function closePatientEditor() {
+    DOM.patientEditorModal.hidden = true;
+    editingPatientIndex = null;
+}
+
+async function savePatientData() {
+    const editor = DOM.patientDataEditor;
+
+    try {
+        // Parse and validate JSON
+        const updatedPatient = JSON.parse(editor.value);
+
+        // Save to backend
+        const response = await fetch('/api/save-patient', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                patient_index: editingPatientIndex,
+                patient_data: updatedPatient
+            })
+        });
+
+        const result = await response.json();
+
+        if (result.success) {
+            // Update local data
+            patients[editingPatientIndex] = updatedPatient;
+            selectedPatient = updatedPatient;
+
+            // Show success message
+            DOM.saveSuccess.hidden = false;
+
+            // Update last modified display
+            updateEditButton();
+
+            // Auto-close after 2 seconds
+            setTimeout(() => {
+                closePatientEditor();
+            }, 2000);
+        } else {
+            alert('Error saving patient: ' + result.error);
+        }
+
+    } catch (error) {
+        alert('Invalid JSON format. Please check your syntax. ' + error.message);
+    }
+}
+
+// Load data on page load
+window.addEventListener('load', loadInitialData);
+
+// Cache the app shell for instant and offline reloads
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+    });
+}
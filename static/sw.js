@@ -0,0 +1,87 @@
+// Service worker: keeps the app shell (page with embedded task and patient lists,
+// static assets) in Cache Storage so the viewer still opens on a flaky connection.
+// The page carries live patient data, so it is fetched network-first and the cached
+// copy is only an offline fallback; content-hashed static assets are served from
+// cache and revalidated in the background. Generated detail views are cached
+// separately in IndexedDB by app.js.
+const SHELL_CACHE = 'shell-v3';
+const SHELL_URLS = ['/'];
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(SHELL_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== SHELL_CACHE).map(key => caches.delete(key))))
+            .then(() => caches.open(SHELL_CACHE))
+            .then(pruneStaticVersions)
+            .then(() => self.clients.claim())
+    );
+});
+
+// Drop cached /static/* entries the cached page no longer references, i.e. the
+// ?v=<hash> versions a newer deploy has replaced, so the cache doesn't grow forever
+async function pruneStaticVersions(cache) {
+    const page = await cache.match('/');
+    if (!page) return;
+    const html = await page.text();
+    const current = new Set(Array.from(html.matchAll(/\/static\/[^"'\s>]+/g), match => match[0]));
+
+    const requests = await cache.keys();
+    await Promise.all(requests.map(request => {
+        const url = new URL(request.url);
+        const path = url.pathname + url.search;
+        if (url.pathname.startsWith('/static/') && !current.has(path)) return cache.delete(request);
+    }));
+}
+
+function isShellRequest(url) {
+    return url.origin === self.location.origin &&
+        (SHELL_URLS.includes(url.pathname) || url.pathname.startsWith('/static/'));
+}
+
+self.addEventListener('fetch', event => {
+    const { request } = event;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || !isShellRequest(url)) return;
+
+    if (SHELL_URLS.includes(url.pathname)) {
+        // Network-first: the page embeds patient data that edits change
+        event.respondWith(caches.open(SHELL_CACHE).then(async cache => {
+            try {
+                const response = await fetch(request);
+                if (response.ok) {
+                    await cache.put(request, response.clone());
+                    event.waitUntil(pruneStaticVersions(cache));
+                }
+                return response;
+            } catch (error) {
+                const cached = await cache.match(request);
+                if (cached) return cached;
+                throw error;
+            }
+        }));
+        return;
+    }
+
+    // Stale-while-revalidate: answer from cache, refresh the entry from the network
+    event.respondWith(caches.open(SHELL_CACHE).then(async cache => {
+        const cached = await cache.match(request);
+        const network = fetch(request).then(response => {
+            if (response.ok) cache.put(request, response.clone());
+            return response;
+        });
+
+        if (cached) {
+            event.waitUntil(network.catch(() => {}));
+            return cached;
+        }
+        return network;
+    }));
+});
@@ -0,0 +1,45 @@
+"""Saved task assistance outputs load with the protocol payload the browser renders"""
+
+import os
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+for module in ('flask', 'flask_cors', 'flask_compress', 'pinecone', 'openai', 'dotenv', 'orjson'):
+    pytest.importorskip(module)
+
+ROOT = Path(__file__).resolve().parent.parent
+OUTPUT_NAME = re.compile(r'^(?P<todo_id>.+)_patient(?P<patient_index>\d+)\.json$')
+
+
+@pytest.fixture(scope='module')
+def viewer():
+    # The app resolves its data files relative to the working directory, and
+    # targeting the index by host keeps Pinecone off the network at import
+    cwd = os.getcwd()
+    os.environ.setdefault('PINECONE_API_KEY', 'test')
+    os.environ.setdefault('OPENAI_API_KEY', 'test')
+    os.environ.setdefault('PINECONE_INDEX_HOST', 'localhost')
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    try:
+        import todo_viewer_enhanced
+        yield todo_viewer_enhanced
+    finally:
+        os.chdir(cwd)
+
+
+def saved_outputs():
+    matches = (OUTPUT_NAME.match(path.name) for path in sorted((ROOT / 'task_assistance_outputs').iterdir()))
+    return [(m['todo_id'], int(m['patient_index'])) for m in matches if m]
+
+
+@pytest.mark.parametrize('todo_id, patient_index', saved_outputs())
+def test_saved_output_has_table_html(viewer, todo_id, patient_index):
+    detail = viewer.load_cached_detail(todo_id, patient_index)
+
+    assert detail is not None
+    assert detail['protocol']['table_html'].startswith('<tr><th>')
+    assert 'full_text' not in detail['protocol']